@@ -6,6 +6,10 @@ from abc import ABC, abstractmethod
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
 from datetime import datetime
+from functools import cached_property
+
+# Line breaks and tabs are flattened to spaces in previews
+_PREVIEW_TT = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
 
 
 @dataclass
@@ -21,6 +25,33 @@ class EmailMessage:
     headers: Optional[Dict[str, str]] = None
     attachments: Optional[List[Dict[str, Any]]] = None
 
+    @cached_property
+    def body_preview(self) -> str:
+        """First 150 characters of the plain text body on a single line"""
+        return (self.body_text or '')[:150].translate(_PREVIEW_TT)
+
+    @cached_property
+    def code(self) -> Optional[str]:
+        """Verification code extracted by CodeExtractor, cached per message"""
+        from .verifier import CodeExtractor
+        return CodeExtractor.extract_code(self)
+
+    def link(self, keyword: Optional[str] = None) -> Optional[str]:
+        """
+        Verification/confirmation link extracted by CodeExtractor, cached per keyword
+
+        Args:
+            keyword: Keyword to filter links (optional)
+
+        Returns:
+            str: Extracted URL, or None if not found
+        """
+        cache = self.__dict__.setdefault('_link_cache', {})
+        if keyword not in cache:
+            from .verifier import CodeExtractor
+            cache[keyword] = CodeExtractor.extract_link(self, keyword)
+        return cache[keyword]
+
 
 class BaseEmailProvider(ABC):
     """Base class for all email providers"""
@@ -24,12 +24,17 @@ class EmailClient:
                 - timeout: Request timeout in seconds (default: 30)
 
         Returns:
-            MailCxProvider instance
+            MailCxProvider instance. All requests made through it share one
+            keep-alive requests.Session, which disconnect() closes.
 
         Example:
             >>> client = EmailClient.create_temp_email()
             >>> client.connect()
             >>> print(f"Your temp email: {client.email}")
+
+            >>> # Or let a with block connect and close the session
+            >>> with EmailClient.create_temp_email() as client:
+            ...     messages = client.get_messages()
         """
         return MailCxProvider(**kwargs)
 
@@ -9,7 +9,7 @@ Based on the mail.cx API structure where:
 import time
 import random
 import string
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from urllib.parse import unquote, quote
 import requests
@@ -17,6 +17,14 @@ import re
 
 from ..base import BaseEmailProvider, EmailMessage
 
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# 将任意字节映射为小写字母，用于一次性生成随机用户名
+_USERNAME_TABLE = bytes(ord(string.ascii_lowercase[i % 26]) for i in range(256))
+
 
 class MailCxProvider(BaseEmailProvider):
     """mail.cx temporary email service provider"""
@@ -24,6 +32,12 @@ class MailCxProvider(BaseEmailProvider):
     MAIL_CX_URL = "https://mail.cx/zh/"
     MAIL_CX_API_BASE = "https://mail.cx/api/api/v1/mailbox"
     MAIL_HOSTS = ["qabq.com", "nqmo.com", "end.tw", "uuf.me", "6n9.net"]
+    # 远低于 auth_token 的有效期，避免复用的 token 在会话中途过期
+    AUTH_TOKEN_TTL = 60  # 秒
+
+    # 请求 token 时使用的邮箱地址 -> (auth_token, 获取时间)，在所有实例间共享。
+    # connect() 在生成邮箱之前获取 token，所以自动创建的邮箱都共用 '' 这一项
+    _auth_token_cache: Dict[str, Tuple[str, float]] = {}
 
     def __init__(self, email: Optional[str] = None, **kwargs):
         """
@@ -40,6 +54,10 @@ class MailCxProvider(BaseEmailProvider):
         self.session = requests.Session()
         self.timeout = kwargs.get('timeout', 30)
         self.registration_time = None  # 用于过滤邮件
+        self._last_etag = None  # 用于条件请求
+        self._mailbox_url = None  # connect() 时预先生成
+        self._cursor_millis = 0  # 已获取邮件中最新的毫秒时间戳
+        self._auth_token_key = None  # 当前 token 在缓存中的键
         self._setup_headers()
 
     def _setup_headers(self):
@@ -57,9 +75,22 @@ class MailCxProvider(BaseEmailProvider):
         """
         Get auth_token from mail.cx for API requests
 
+        Tokens are cached for AUTH_TOKEN_TTL seconds, keyed by the email
+        address the request is made for, so repeated connects skip the
+        request to mail.cx. connect() asks for a token before it generates
+        an address, so all auto-created mailboxes share one entry (the ''
+        key); only a provider given a fixed address gets its own entry.
+        Entries are evicted when mail.cx rejects the token (HTTP 401/403).
+
         Returns:
             str: Decoded auth_token, or None if failed
         """
+        self._auth_token_key = self.email
+        cached = self._auth_token_cache.get(self.email)
+        if cached and time.time() - cached[1] < self.AUTH_TOKEN_TTL:
+            print(f"🔑 Reusing cached auth_token: {cached[0][:20]}...")
+            return cached[0]
+
         try:
             print(f"🔑 Requesting auth_token from mail.cx...")
 
@@ -76,6 +107,7 @@ class MailCxProvider(BaseEmailProvider):
                 raw_token = response.cookies['auth_token']
                 decoded_token = unquote(raw_token).strip().strip('"').strip("'").strip()
                 print(f"✅ Got auth_token: {decoded_token[:20]}...")
+                self._auth_token_cache[self.email] = (decoded_token, time.time())
                 return decoded_token
             else:
                 print(f"❌ No auth_token in response. Available cookies: {list(response.cookies.keys())}")
@@ -92,7 +124,7 @@ class MailCxProvider(BaseEmailProvider):
             str: Generated email address
         """
         username_length = random.randint(6, 10)
-        username = ''.join(random.choices(string.ascii_lowercase, k=username_length))
+        username = random.randbytes(username_length).translate(_USERNAME_TABLE).decode('ascii')
         domain = random.choice(self.MAIL_HOSTS)
         email = f"{username}@{domain}"
         print(f"📧 Generated random email: {email}")
@@ -125,6 +157,10 @@ class MailCxProvider(BaseEmailProvider):
         if not self.email or self.config.get('auto_create', True):
             self.create_email()
 
+        # 预先生成邮箱 URL 和 authorization header，轮询时直接复用
+        self._mailbox_url = f"{self.MAIL_CX_API_BASE}/{self.email}"
+        self.session.headers['authorization'] = f'bearer {self.auth_token}'
+
         return True
 
     def disconnect(self):
@@ -137,7 +173,8 @@ class MailCxProvider(BaseEmailProvider):
         folder: str = 'INBOX',
         limit: int = 10,
         unread_only: bool = False,
-        since: Optional[datetime] = None
+        since: Optional[datetime] = None,
+        only_if_changed: bool = False
     ) -> List[EmailMessage]:
         """
         Retrieve email messages from mail.cx
@@ -147,82 +184,278 @@ class MailCxProvider(BaseEmailProvider):
             limit: Maximum number of messages to retrieve
             unread_only: Not used for mail.cx (kept for interface compatibility)
             since: Only retrieve messages after this datetime
+            only_if_changed: Send If-None-Match with the last ETag and return
+                an empty list if the mailbox is unchanged (HTTP 304)
 
         Returns:
             List of EmailMessage objects
         """
-        if not self.auth_token:
-            print("❌ Not connected. Call connect() first.")
-            return []
-
-        if not self.email:
-            print("❌ No email address. Call connect() first.")
+        if not self._ensure_connected():
             return []
 
         try:
             print(f"📬 Fetching messages for {self.email}...")
+            messages = list(self.iter_messages(limit, since, only_if_changed))
+            print(f"✅ Retrieved {len(messages)} messages")
+            return messages
+
+        except Exception as e:
+            print(f"❌ Failed to fetch messages: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
 
-            # 更新 headers 以包含 authorization
-            headers = {
-                'authorization': f'bearer {self.auth_token}',
-                'referer': 'https://mail.cx/zh/',
-            }
+    def iter_messages(
+        self,
+        limit: int = 10,
+        since: Optional[datetime] = None,
+        only_if_changed: bool = False
+    ) -> Iterator[EmailMessage]:
+        """
+        Iterate over email messages, building each one only when it is consumed
 
-            response = self.session.get(
-                f"{self.MAIL_CX_API_BASE}/{self.email}",
-                headers=headers,
-                timeout=self.timeout
-            )
+        Same filtering as get_messages(), but callers that stop early (e.g.
+        at the first matching message) skip parsing the rest. Request errors
+        are raised instead of being printed.
 
-            if response.status_code != 200:
-                print(f"❌ Failed to fetch messages: {response.status_code}")
-                return []
+        Args:
+            limit: Maximum number of messages to retrieve. Applied on the
+                client; mail.cx always returns the whole mailbox
+            since: Only retrieve messages after this datetime
+            only_if_changed: Send If-None-Match with the last ETag and yield
+                nothing if the mailbox is unchanged (HTTP 304)
+
+        Yields:
+            EmailMessage objects
+        """
+        if not self._ensure_connected():
+            return
+
+        data = self._fetch_mailbox(only_if_changed)
+        if data is None:
+            return
 
-            data = response.json()
-            messages = []
+        since_millis = self._since_millis(since)
 
-            # 转换时间戳（如果提供）
-            since_millis = None
-            if since:
-                since_millis = int(since.timestamp() * 1000)
-            elif self.registration_time:
-                since_millis = self.registration_time
+        for msg_data in data[:limit]:
+            # 过滤时间
+            msg_time = msg_data.get('posix-millis', 0)
+            if msg_time > self._cursor_millis:
+                self._cursor_millis = msg_time
+            if since_millis and msg_time <= since_millis:
+                continue
+
+            yield self._parse_message(msg_data)
+
+    def list_ids(
+        self,
+        limit: int = 10,
+        since: Optional[datetime] = None
+    ) -> List[Tuple[str, Optional[datetime]]]:
+        """
+        Retrieve only the IDs and receive times of messages
+
+        Cheaper than get_messages() for polling since no EmailMessage objects
+        are built; load the messages that turn out to be new with fetch().
+
+        Args:
+            limit: Maximum number of messages to list
+            since: Only list messages after this datetime
+
+        Returns:
+            List of (message ID, received_at) tuples
+        """
+        if not self._ensure_connected():
+            return []
+
+        try:
+            print(f"📬 Listing messages for {self.email}...")
+
+            data = self._fetch_mailbox()
+            if data is None:
+                return []
+
+            ids = []
+            since_millis = self._since_millis(since)
+            cursor_millis = self._cursor_millis
 
             for msg_data in data[:limit]:
-                # 过滤时间
                 msg_time = msg_data.get('posix-millis', 0)
+                if msg_time > cursor_millis:
+                    cursor_millis = msg_time
                 if since_millis and msg_time <= since_millis:
                     continue
 
-                # 解析时间
-                received_at = None
-                if msg_time:
-                    try:
-                        received_at = datetime.fromtimestamp(msg_time / 1000)
-                    except:
-                        pass
-
-                message = EmailMessage(
-                    id=msg_data.get('id', ''),
-                    subject=msg_data.get('subject', ''),
-                    sender=msg_data.get('from', {}).get('address', '') if isinstance(msg_data.get('from'), dict) else str(msg_data.get('from', '')),
-                    recipient=self.email,
-                    body_text=msg_data.get('text', ''),
-                    body_html=msg_data.get('html', ''),
-                    received_at=received_at,
-                    headers=msg_data.get('headers', {})
-                )
-                messages.append(message)
+                ids.append((msg_data.get('id', ''), self._parse_millis(msg_time)))
 
-            print(f"✅ Retrieved {len(messages)} messages")
-            return messages
+            self._cursor_millis = cursor_millis
+            return ids
 
         except Exception as e:
-            print(f"❌ Failed to fetch messages: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Failed to list messages: {e}")
             return []
 
+    def fetch(self, message_id: str) -> Optional[EmailMessage]:
+        """
+        Retrieve a single message including its body
+
+        Args:
+            message_id: Message ID, e.g. from list_ids()
+
+        Returns:
+            EmailMessage, or None if failed
+        """
+        if not self._ensure_connected():
+            return None
+
+        try:
+            response = self.session.get(
+                f"{self._mailbox_url}/{message_id}",
+                timeout=self.timeout
+            )
+
+            if response.status_code != 200:
+                self._check_auth(response)
+                print(f"❌ Failed to fetch message {message_id}: {response.status_code}")
+                return None
+
+            return self._parse_message(_loads(response.content))
+
+        except Exception as e:
+            print(f"❌ Failed to fetch message {message_id}: {e}")
+            return None
+
+    def _ensure_connected(self) -> bool:
+        """
+        Check that connect() has set up a token and an email address
+
+        Returns:
+            bool: True if connected, otherwise prints why and returns False
+        """
+        if not self.auth_token:
+            print("❌ Not connected. Call connect() first.")
+            return False
+
+        if not self.email:
+            print("❌ No email address. Call connect() first.")
+            return False
+
+        return True
+
+    def _check_auth(self, response: requests.Response):
+        """
+        Evict the cached auth_token if mail.cx rejected it
+
+        Args:
+            response: Response of an authorized API request
+        """
+        if response.status_code in (401, 403):
+            self._auth_token_cache.pop(self._auth_token_key, None)
+
+    def _fetch_mailbox(self, only_if_changed: bool = False) -> Optional[list]:
+        """
+        Request the raw message list of the mailbox
+
+        Args:
+            only_if_changed: Send If-None-Match with the last ETag
+
+        Returns:
+            list: Decoded message list, or None if unchanged (HTTP 304) or failed
+        """
+        # authorization 已在 connect() 时写入 session headers
+        headers = None
+        if only_if_changed and self._last_etag:
+            headers = {'if-none-match': self._last_etag}
+
+        response = self.session.get(
+            self._mailbox_url,
+            headers=headers,
+            timeout=self.timeout
+        )
+
+        if response.status_code == 304:
+            print("✅ Mailbox unchanged")
+            return None
+
+        if response.status_code != 200:
+            self._check_auth(response)
+            print(f"❌ Failed to fetch messages: {response.status_code}")
+            return None
+
+        self._last_etag = response.headers.get('ETag')
+        return _loads(response.content)
+
+    def _since_millis(self, since: Optional[datetime]) -> Optional[int]:
+        """
+        Convert a since filter to a millisecond timestamp
+
+        Falls back to the registration time of a created email.
+        """
+        if since:
+            return int(since.timestamp() * 1000)
+        return self.registration_time
+
+    @staticmethod
+    def _parse_millis(msg_time) -> Optional[datetime]:
+        """Convert a posix-millis value to a datetime, or None if missing/invalid"""
+        if msg_time:
+            try:
+                return datetime.fromtimestamp(msg_time * 0.001)
+            except (ValueError, OverflowError, OSError):
+                pass
+        return None
+
+    def _parse_message(self, msg_data: dict) -> EmailMessage:
+        """
+        Build an EmailMessage from a message returned by the API
+
+        Args:
+            msg_data: Message dict from the mailbox list or a single message
+
+        Returns:
+            EmailMessage object
+        """
+        get = msg_data.get
+
+        raw_from = get('from')
+        if isinstance(raw_from, dict):
+            sender = raw_from.get('address', '')
+        else:
+            sender = self._format_sender(raw_from)
+
+        # 单封邮件接口把正文放在 body 字段中
+        body = get('body')
+        if isinstance(body, dict):
+            body_text = body.get('text', '')
+            body_html = body.get('html', '')
+        else:
+            body_text = get('text', '')
+            body_html = get('html', '')
+
+        return EmailMessage(
+            id=get('id', ''),
+            subject=get('subject', ''),
+            sender=sender,
+            recipient=self.email,
+            body_text=body_text,
+            body_html=body_html,
+            received_at=self._parse_millis(get('posix-millis', 0)),
+            headers=get('headers', {})
+        )
+
+    @staticmethod
+    def _format_sender(raw_from) -> str:
+        """
+        Format a non-dict 'from' field as a sender string
+
+        Args:
+            raw_from: Raw 'from' value from the API (string or None)
+
+        Returns:
+            str: Sender address, or empty string if missing
+        """
+        return str(raw_from) if raw_from is not None else ''
+
     def wait_for_message(
         self,
         timeout: int = 300,
@@ -235,7 +468,8 @@ class MailCxProvider(BaseEmailProvider):
 
         Args:
             timeout: Maximum time to wait in seconds
-            interval: Check interval in seconds
+            interval: Maximum check interval in seconds (polling starts at 1s
+                and backs off towards it while nothing new arrives)
             filter_subject: Only return message with matching subject (substring match)
             filter_sender: Only return message from matching sender (substring match)
 
@@ -249,33 +483,42 @@ class MailCxProvider(BaseEmailProvider):
         # 记录开始等待的时间
         wait_start_millis = int(time.time() * 1000)
 
-        while time.time() - start_time < timeout:
-            time.sleep(interval)
-
-            messages = self.get_messages(limit=20)
+        # 指数退避：从 1 秒开始，没有新邮件时逐步增加到 interval
+        delay = min(1.0, interval)
 
-            for msg in messages:
-                # 跳过已见过的消息
-                if msg.id in seen_ids:
-                    continue
+        while time.time() - start_time < timeout:
+            time.sleep(delay)
+
+            # 只获取等待开始后、且比已获取邮件更新的邮件
+            since_millis = max(self._cursor_millis, wait_start_millis - 1)
+            delay = min(interval, delay * 1.5)
+
+            try:
+                # 逐封解析，找到匹配的邮件后不再解析剩余邮件。
+                # limit 只在本地截取，服务器总是返回整个邮箱，所以保留 20 封的检查范围
+                for msg in self.iter_messages(
+                    limit=20,
+                    since=datetime.fromtimestamp(since_millis / 1000),
+                    only_if_changed=True
+                ):
+                    # 跳过已见过的消息
+                    if msg.id in seen_ids:
+                        continue
 
-                seen_ids.add(msg.id)
+                    seen_ids.add(msg.id)
+                    delay = min(1.0, interval)
 
-                # 检查时间（只看等待开始后的邮件）
-                if msg.received_at:
-                    msg_millis = int(msg.received_at.timestamp() * 1000)
-                    if msg_millis < wait_start_millis:
+                    # 检查过滤条件
+                    if filter_subject and filter_subject.lower() not in msg.subject.lower():
                         continue
 
-                # 检查过滤条件
-                if filter_subject and filter_subject.lower() not in msg.subject.lower():
-                    continue
-
-                if filter_sender and filter_sender.lower() not in msg.sender.lower():
-                    continue
+                    if filter_sender and filter_sender.lower() not in msg.sender.lower():
+                        continue
 
-                print(f"✅ New message received: {msg.subject}")
-                return msg
+                    print(f"✅ New message received: {msg.subject}")
+                    return msg
+            except Exception as e:
+                print(f"❌ Failed to fetch messages: {e}")
 
             elapsed = int(time.time() - start_time)
             print(f"⏳ Still waiting... ({elapsed}/{timeout}s)")
@@ -317,13 +560,8 @@ class MailCxProvider(BaseEmailProvider):
             return False
 
         try:
-            headers = {
-                'authorization': f'bearer {self.auth_token}',
-            }
-
             response = self.session.delete(
-                f"{self.MAIL_CX_API_BASE}/{self.email}/{message_id}",
-                headers=headers,
+                f"{self._mailbox_url}/{message_id}",
                 timeout=self.timeout
             )
 
@@ -331,6 +569,7 @@ class MailCxProvider(BaseEmailProvider):
                 print(f"✅ Message {message_id} deleted")
                 return True
             else:
+                self._check_auth(response)
                 print(f"❌ Failed to delete message: {response.status_code}")
                 return False
         except Exception as e:
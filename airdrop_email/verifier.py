@@ -3,32 +3,311 @@ Verification code extractor for email messages
 """
 
 import re
-from typing import Optional, List, Dict, Any
-from bs4 import BeautifulSoup
+import sys
+from functools import lru_cache
+from html import unescape
+from typing import Optional, List, Dict, Any, Iterator, Tuple, TYPE_CHECKING
 
 from .base import EmailMessage
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# The Lexbor backend; the Modest one (selectolax.parser) is gone in selectolax 1.0
+try:
+    from selectolax.lexbor import LexborHTMLParser as _HP
+except ImportError:
+    _HP = None
+
+# Possessive quantifiers rule out backtracking into the code character
+# classes. re supports them from Python 3.11 and is faster than the regex
+# module there, so regex is only used on older versions.
+if sys.version_info >= (3, 11):
+    _re = re
+else:
+    try:
+        import regex as _re
+    except ImportError:
+        _re = re
+
+_POSSESSIVE_SUPPORTED = _re is not re or sys.version_info >= (3, 11)
+
+
+# Common verification code patterns, most specific context first
+_RAW_PATTERNS = [
+    # URL parameters
+    r'[?&]code=([A-Z0-9]++)',
+    r'[?&]token=([A-Z0-9]++)',
+    # Common phrases with codes containing a digit, fenced and bounded to
+    # keep backtracking linear
+    r'\b(?:code|verification code|verify code|confirmation code|otp|pin)\b[\s:：]{0,4}+(?=[A-Z]*\d)([A-Z0-9]{4,8}+)\b',
+    # CJK text has no word boundary before/after adjacent characters
+    r'(?:验证码|確認碼|驗證碼)[\s:：]{0,4}+([A-Z0-9]{4,8}+)(?![A-Z0-9])',
+    # 6, 4 and 8-digit codes, not part of a date like 2024-01-31 or 01/31/2024
+    r'(?<![-/])\b(\d{6})\b(?![-/])',
+    r'(?<![-/])\b(\d{4})\b(?![-/])',
+    r'(?<![-/])\b(\d{8})\b(?![-/])',
+    # Letter-only codes after a phrase, ranked after the digit codes since
+    # wording like "code below" or "PIN number" also matches here
+    r'\b(?:code|verification code|verify code|confirmation code|otp|pin)\b[\s:：]{0,4}+([A-Z0-9]{4,8}+)\b',
+    # Alphanumeric codes (6-8 characters)
+    r'\b([A-Z0-9]{6,8}+)\b',
+]
+
+# Plain-text bodies at least this long are scanned before the HTML body
+_MIN_PLAIN_TEXT_LENGTH = 64
+
+# Common false positives that are never treated as codes
+_FALSE_POSITIVES = frozenset({
+    '2024', '2023', '2022', '2021', '2020',  # Years
+    '1234', '0000', '9999',  # Too simple
+})
+
+
+def _compile(pattern: str) -> Any:
+    """
+    Compile a default pattern case-insensitively with the best available engine
+
+    Possessive quantifiers are turned back into greedy ones when the engine
+    does not support them; the patterns match the same strings either way.
+
+    Args:
+        pattern: Pattern from _RAW_PATTERNS
+
+    Returns:
+        Compiled pattern object
+    """
+    if not _POSSESSIVE_SUPPORTED:
+        pattern = pattern.replace('}+', '}').replace('++', '+')
+    return _re.compile(pattern, _re.IGNORECASE)
+
+
+# Compiled once at import time so extraction skips the re module cache lookup
+_COMPILED_PATTERNS = [_compile(p) for p in _RAW_PATTERNS]
+
+
+@lru_cache(maxsize=32)
+def _compile_custom(pattern: str) -> re.Pattern:
+    """
+    Compile a caller-supplied code pattern, cached by pattern string
+
+    Args:
+        pattern: Custom regex pattern passed to extract_code
+
+    Returns:
+        re.Pattern: Case-insensitive compiled pattern
+    """
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# Indexes of the patterns that can only match digits
+_DIGIT_PATTERNS = frozenset({4, 5, 6})
+
+# Index of the bare alphanumeric pattern, which also matches ordinary words
+_ALNUM_PATTERN = 8
+
+# Cheap prefilter deciding whether the digit-only patterns can match at all
+_DIGIT_RE = re.compile(r'\d')
+
+
+# Comments, script/style blocks and tags, stripped when only text is needed.
+# A tag must start with a name, "/", "!" or "?", so a bare "<" in text stays.
+_TAG_RE = re.compile(
+    r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>|<[A-Za-z/!?][^>]*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Pattern for URLs, matched against the UTF-8 encoded text. ASCII-only
+# classes and a bounded length keep the per-byte work small.
+_URL_RE = re.compile(rb'https?://[^\s<>"\'\)]{1,2048}', re.ASCII)
+
+
+def _iter_urls(text: str) -> Iterator[str]:
+    """
+    Yield URLs found in text
+
+    Candidate offsets are located with bytes.find first and the URL regex is
+    only anchored at those offsets instead of scanning the whole text.
+
+    Args:
+        text: Text to search
+
+    Yields:
+        str: URLs in order of appearance
+    """
+    data = text.encode('utf-8', 'ignore')
+    pos = data.find(b'http')
+
+    while pos != -1:
+        match = _URL_RE.match(data, pos)
+        if match:
+            yield match.group(0).decode('utf-8', 'ignore')
+            pos = data.find(b'http', match.end())
+        else:
+            pos = data.find(b'http', pos + 4)
+
+
+def _get_soup(message: EmailMessage) -> 'BeautifulSoup':
+    """
+    Parse the HTML body once and cache the soup on the message
+
+    Script and style elements are removed before the soup is cached. bs4 is
+    only imported here, so code extraction never pays for importing it.
+
+    Args:
+        message: EmailMessage object with an HTML body
+
+    Returns:
+        BeautifulSoup: Parsed HTML body
+    """
+    soup = getattr(message, '_cached_soup', None)
+    if soup is None:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(message.body_html, _HTML_PARSER)
+        # Remove script and style elements
+        for script in soup(['script', 'style']):
+            script.decompose()
+        message._cached_soup = soup
+    return soup
+
+
+def _get_links(message: EmailMessage) -> List[Tuple[str, str]]:
+    """
+    Get (href, link text) pairs of all <a href> elements, cached on the message
+
+    Args:
+        message: EmailMessage object with an HTML body
+
+    Returns:
+        list: (href, link text) tuples in document order
+    """
+    links = getattr(message, '_cached_links', None)
+    if links is None:
+        if _HP is not None:
+            links = [
+                (a.attributes.get('href') or '', a.text(strip=True))
+                for a in _HP(message.body_html).css('a[href]')
+            ]
+        else:
+            links = [
+                (a['href'], a.get_text(strip=True))
+                for a in _get_soup(message).find_all('a', href=True)
+            ]
+        message._cached_links = links
+    return links
+
+
+def _get_links_lowered(message: EmailMessage) -> List[Tuple[str, str, str]]:
+    """
+    Get (href, lower-cased href, lower-cased link text) tuples, cached on the message
+
+    Args:
+        message: EmailMessage object with an HTML body
+
+    Returns:
+        list: Tuples in document order, ready for _scan_links
+    """
+    lowered = getattr(message, '_cached_links_lowered', None)
+    if lowered is None:
+        lowered = [
+            (href, href.lower(), link_text.lower())
+            for href, link_text in _get_links(message)
+        ]
+        message._cached_links_lowered = lowered
+    return lowered
+
+
+def _scan_links(links_lowered: List[Tuple[str, str, str]], keyword_l: str) -> Optional[str]:
+    """
+    Find the first link whose href or text contains a keyword
+
+    Args:
+        links_lowered: Tuples from _get_links_lowered
+        keyword_l: Lower-cased keyword
+
+    Returns:
+        str: Matching href, or None if not found
+    """
+    for href, href_l, text_l in links_lowered:
+        if keyword_l in href_l or keyword_l in text_l:
+            return href
+    return None
+
+
+def _html_to_text_fast(html: str) -> str:
+    """
+    Get the text of HTML without building a BeautifulSoup tree
+
+    Uses selectolax when installed, otherwise strips tags with a regex.
+
+    Args:
+        html: HTML source
+
+    Returns:
+        str: Unescaped text with whitespace collapsed to single spaces
+    """
+    if _HP is not None:
+        tree = _HP(html)
+        tree.strip_tags(['script', 'style'])
+        root = tree.root
+        return ' '.join(root.text(separator=' ', strip=True).split()) if root else ''
+
+    return ' '.join(unescape(_TAG_RE.sub(' ', html)).split())
+
+
+def _get_html_text(message: EmailMessage) -> str:
+    """
+    Get the visible text of the HTML body, cached on the message
+
+    Args:
+        message: EmailMessage object with an HTML body
+
+    Returns:
+        str: Text content of the HTML body
+    """
+    html_text = getattr(message, '_cached_html_text', None)
+    if html_text is None:
+        html_text = _html_to_text_fast(message.body_html)
+        message._cached_html_text = html_text
+    return html_text
+
+
+def _find_text_url(text: str, keyword: Optional[str] = None) -> Optional[str]:
+    """
+    Find the first URL in plain text, optionally containing a keyword
+
+    Args:
+        text: Plain text to search
+        keyword: Keyword the URL must contain (case-insensitive)
+
+    Returns:
+        str: Matching URL, or None if not found
+    """
+    if not keyword:
+        return next(_iter_urls(text), None)
+
+    keyword = keyword.lower()
+    if keyword not in text.lower():
+        return None
+
+    for url in _iter_urls(text):
+        if keyword in url.lower():
+            return url
+
+    return None
+
 
 class CodeExtractor:
     """Extract verification codes from email messages"""
 
-    # Common verification code patterns
-    PATTERNS = [
-        # 6-digit codes
-        r'\b(\d{6})\b',
-        # 4-digit codes
-        r'\b(\d{4})\b',
-        # 8-digit codes
-        r'\b(\d{8})\b',
-        # Alphanumeric codes (6-8 characters)
-        r'\b([A-Z0-9]{6,8})\b',
-        # Common phrases with codes
-        r'(?:code|verification code|verify code|confirmation code|otp|pin)[\s:：]*([A-Z0-9]{4,8})',
-        r'(?:验证码|確認碼|驗證碼)[\s:：]*([A-Z0-9]{4,8})',
-        # URL parameters
-        r'[?&]code=([A-Z0-9]+)',
-        r'[?&]token=([A-Z0-9]+)',
-    ]
+    # Raw pattern strings, kept for backwards compatibility
+    PATTERNS = _RAW_PATTERNS
 
     @staticmethod
     def extract_code(
@@ -42,39 +321,83 @@ class CodeExtractor:
         Args:
             message: EmailMessage object
             pattern: Custom regex pattern (if None, use default patterns)
-            use_html: Try to extract from HTML body first (more accurate)
+            use_html: Also search the HTML body. It is scanned before the
+                plain text, unless the plain text is long enough to be
+                scanned on its own first and yields a trusted hit
 
         Returns:
             str: Extracted code, or None if not found
         """
         text = message.body_text or ''
 
-        # Try HTML body first if available
-        if use_html and message.body_html:
-            soup = BeautifulSoup(message.body_html, 'html.parser')
-            # Remove script and style elements
-            for script in soup(['script', 'style']):
-                script.decompose()
-            html_text = soup.get_text(separator=' ', strip=True)
-            text = html_text + '\n' + text
+        if not (use_html and message.body_html):
+            return CodeExtractor._search_code(text, pattern)
+
+        # A substantial plain-text body usually carries the same content as
+        # the HTML body, so scan it alone first. A hit of the bare
+        # alphanumeric pattern may just be a word from a stub plain part
+        # ("This message requires an HTML-capable email client"), so only
+        # context or digit hits are trusted without looking at the HTML.
+        if len(text) >= _MIN_PLAIN_TEXT_LENGTH:
+            if pattern:
+                code = CodeExtractor._search_code(text, pattern)
+            else:
+                code, index = CodeExtractor._find_code(text)
+                if index == _ALNUM_PATTERN:
+                    code = None
+            if code:
+                return code
+
+        return CodeExtractor._search_code(_get_html_text(message) + '\n' + text, pattern)
+
+    @staticmethod
+    def _search_code(text: str, pattern: Optional[str] = None) -> Optional[str]:
+        """
+        Search text for a verification code
+
+        Args:
+            text: Text to search
+            pattern: Custom regex pattern (if None, use default patterns)
 
+        Returns:
+            str: Extracted code, or None if not found
+        """
         # Use custom pattern if provided
         if pattern:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = _compile_custom(pattern).search(text)
             if match:
                 return match.group(1)
             return None
 
-        # Try all default patterns
-        for p in CodeExtractor.PATTERNS:
-            match = re.search(p, text, re.IGNORECASE)
+        return CodeExtractor._find_code(text)[0]
+
+    @staticmethod
+    def _find_code(text: str) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Search text for a verification code with the default patterns
+
+        Args:
+            text: Text to search
+
+        Returns:
+            tuple: Extracted code and the index of the pattern that found it,
+                or (None, None) if not found
+        """
+        # Digit-only patterns are left out when the text has no digits
+        has_digits = _DIGIT_RE.search(text) is not None
+
+        # Try patterns in precedence order; each search stops at its first match
+        for index, p in enumerate(_COMPILED_PATTERNS):
+            if not has_digits and index in _DIGIT_PATTERNS:
+                continue
+            match = p.search(text)
             if match:
                 code = match.group(1)
                 # Validate code (avoid false positives like years)
                 if CodeExtractor._is_valid_code(code):
-                    return code
+                    return code, index
 
-        return None
+        return None, None
 
     @staticmethod
     def _is_valid_code(code: str) -> bool:
@@ -88,16 +411,11 @@ class CodeExtractor:
             bool: True if likely a verification code
         """
         # Skip common false positives
-        false_positives = [
-            '2024', '2023', '2022', '2021', '2020',  # Years
-            '1234', '0000', '9999',  # Too simple
-        ]
-
-        if code in false_positives:
+        if code in _FALSE_POSITIVES:
             return False
 
         # Must be 4-8 characters
-        if len(code) < 4 or len(code) > 8:
+        if not 4 <= len(code) <= 8:
             return False
 
         return True
@@ -120,17 +438,17 @@ class CodeExtractor:
         text = message.body_text or ''
 
         if use_html and message.body_html:
-            soup = BeautifulSoup(message.body_html, 'html.parser')
-            for script in soup(['script', 'style']):
-                script.decompose()
-            html_text = soup.get_text(separator=' ', strip=True)
-            text = html_text + '\n' + text
+            text = _get_html_text(message) + '\n' + text
 
         codes = []
         seen = set()
 
-        for p in CodeExtractor.PATTERNS:
-            matches = re.finditer(p, text, re.IGNORECASE)
+        has_digits = _DIGIT_RE.search(text) is not None
+
+        for index, p in enumerate(_COMPILED_PATTERNS):
+            if not has_digits and index in _DIGIT_PATTERNS:
+                continue
+            matches = p.finditer(text)
             for match in matches:
                 code = match.group(1)
                 if code not in seen and CodeExtractor._is_valid_code(code):
@@ -154,39 +472,20 @@ class CodeExtractor:
         Returns:
             str: Extracted URL, or None if not found
         """
-        # Pattern for URLs
-        url_pattern = r'https?://[^\s<>"]+|www\.[^\s<>"]+'
-
-        text = message.body_text or ''
-
         # Try HTML body for more accurate link extraction
         if message.body_html:
-            soup = BeautifulSoup(message.body_html, 'html.parser')
-            links = soup.find_all('a', href=True)
-
-            for link in links:
-                href = link['href']
-                link_text = link.get_text(strip=True)
-
-                # Filter by keyword if provided
-                if keyword:
-                    if keyword.lower() in href.lower() or keyword.lower() in link_text.lower():
-                        return href
-                else:
-                    # Return first http(s) link
-                    if href.startswith(('http://', 'https://')):
-                        return href
-
-        # Fallback to regex on plain text
-        matches = re.findall(url_pattern, text)
-        for url in matches:
+            # Filter by keyword if provided
             if keyword:
-                if keyword.lower() in url.lower():
-                    return url
+                href = _scan_links(_get_links_lowered(message), keyword.lower())
+                if href:
+                    return href
             else:
-                return url
+                # Return first http(s) link
+                for href, _ in _get_links(message):
+                    if href.startswith(('http://', 'https://')):
+                        return href
 
-        return None
+        return _find_text_url(message.body_text or '', keyword)
 
     @staticmethod
     def extract_info(message: EmailMessage) -> Dict[str, Any]:
@@ -208,15 +507,17 @@ class CodeExtractor:
             'sender': message.sender,
         }
 
-        # Extract all links
-        if message.body_html:
-            soup = BeautifulSoup(message.body_html, 'html.parser')
-            links = soup.find_all('a', href=True)
-            info['links'] = [link['href'] for link in links if link['href'].startswith(('http://', 'https://'))]
+        # Parse links once and lower-case them once for all keywords
+        links = _get_links(message) if message.body_html else []
+        info['links'] = [href for href, _ in links if href.startswith(('http://', 'https://'))]
+        lowered = _get_links_lowered(message) if links else []
+        text = message.body_text or ''
 
         # Try to find verification link
         for keyword in ['verify', 'confirm', 'activate', 'validation', '验证', '確認']:
-            link = CodeExtractor.extract_link(message, keyword)
+            link = _scan_links(lowered, keyword)
+            if not link:
+                link = _find_text_url(text, keyword)
             if link:
                 info['verification_link'] = link
                 break
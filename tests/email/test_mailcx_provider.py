@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+MailCxProvider 离线测试
+用假的 session 代替 mail.cx 接口，验证缓存、条件请求、游标和单封邮件解析
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from airdrop_email.base import EmailMessage
+from airdrop_email.mail_cx.provider import MailCxProvider
+from tests.email.test_mailcx_simple import poll_emails
+
+
+class FakeResponse:
+    """只包含 provider 用到的字段的响应"""
+
+    def __init__(self, status_code=200, data=None, headers=None, cookies=None):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode() if data is not None else b''
+        self.headers = headers or {}
+        self.cookies = cookies or {}
+
+
+class FakeSession:
+    """按顺序返回预设响应，并记录每次请求"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.headers = {}
+        self.cookies = mock.Mock()
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+    def delete(self, url, timeout=None):
+        self.requests.append((url, None))
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def mailbox_entry(msg_id, millis, subject='Hello'):
+    """邮箱列表接口中的一封邮件"""
+    return {
+        'id': msg_id,
+        'from': '<noreply@example.com>',
+        'subject': subject,
+        'posix-millis': millis,
+        'text': '',
+        'html': '',
+    }
+
+
+def make_provider(*responses):
+    """构造一个已连接、使用假 session 的 provider"""
+    provider = MailCxProvider(email='user@qabq.com', auto_create=False)
+    provider.session = FakeSession(*responses)
+    provider.auth_token = 'token'
+    provider._mailbox_url = f"{MailCxProvider.MAIL_CX_API_BASE}/{provider.email}"
+    return provider
+
+
+class TestConditionalRequests(unittest.TestCase):
+    """ETag / If-None-Match"""
+
+    def test_unchanged_mailbox_returns_nothing(self):
+        provider = make_provider(
+            FakeResponse(data=[mailbox_entry('m1', 1000)], headers={'ETag': '"v1"'}),
+            FakeResponse(status_code=304),
+        )
+
+        self.assertEqual([m.id for m in provider.get_messages()], ['m1'])
+        self.assertEqual(provider.get_messages(only_if_changed=True), [])
+
+        # 第二次请求带上了第一次的 ETag
+        self.assertIsNone(provider.session.requests[0][1])
+        self.assertEqual(provider.session.requests[1][1], {'if-none-match': '"v1"'})
+
+
+class TestCursor(unittest.TestCase):
+    """毫秒游标和 since 过滤"""
+
+    def test_list_ids_filters_and_advances_cursor(self):
+        entries = [
+            mailbox_entry('m3', 1_700_000_000_789),
+            mailbox_entry('m2', 1_700_000_000_456),
+            mailbox_entry('m1', 1_700_000_000_123),
+        ]
+        provider = make_provider(FakeResponse(data=entries), FakeResponse(data=entries))
+
+        ids = provider.list_ids()
+        self.assertEqual([msg_id for msg_id, _ in ids], ['m3', 'm2', 'm1'])
+        self.assertEqual(provider._cursor_millis, 1_700_000_000_789)
+
+        # 把返回的时间作为 since 传回，毫秒换算不能让同一封邮件再次出现
+        since = dict(ids)['m2']
+        self.assertEqual([msg_id for msg_id, _ in provider.list_ids(since=since)], ['m3'])
+
+    def test_since_millis_round_trip(self):
+        provider = make_provider()
+        for millis in (1_700_000_000_001, 1_700_000_000_123, 1_700_000_000_999):
+            with self.subTest(millis=millis):
+                since = provider._parse_millis(millis)
+                self.assertEqual(provider._since_millis(since), millis)
+
+
+class TestAuthTokenCache(unittest.TestCase):
+    """auth_token 缓存的复用和失效"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(MailCxProvider._auth_token_cache, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def token_response(self, token):
+        return FakeResponse(cookies={'auth_token': f'%22{token}%22'})
+
+    def test_token_is_reused_within_ttl(self):
+        first = MailCxProvider()
+        first.session = FakeSession(self.token_response('abc'))
+        self.assertEqual(first.get_auth_token(), 'abc')
+
+        second = MailCxProvider()
+        second.session = FakeSession()
+        self.assertEqual(second.get_auth_token(), 'abc')
+        self.assertEqual(second.session.requests, [])
+
+    def test_expired_token_is_refetched(self):
+        MailCxProvider._auth_token_cache[''] = ('old', time.time() - MailCxProvider.AUTH_TOKEN_TTL - 1)
+
+        provider = MailCxProvider()
+        provider.session = FakeSession(self.token_response('new'))
+        self.assertEqual(provider.get_auth_token(), 'new')
+
+    def test_rejected_token_is_evicted(self):
+        for status_code in (401, 403):
+            with self.subTest(status_code=status_code):
+                provider = MailCxProvider()
+                provider.session = FakeSession(self.token_response('abc'))
+                provider.connect()
+                self.assertIn('', MailCxProvider._auth_token_cache)
+
+                provider.session.responses.append(FakeResponse(status_code=status_code))
+                self.assertEqual(provider.get_messages(), [])
+                self.assertNotIn('', MailCxProvider._auth_token_cache)
+
+
+class TestFetch(unittest.TestCase):
+    """单封邮件接口"""
+
+    def test_body_dict_layout(self):
+        provider = make_provider(FakeResponse(data={
+            'id': 'm1',
+            'from': {'address': 'noreply@example.com'},
+            'subject': 'Verify',
+            'posix-millis': 1_700_000_000_000,
+            'body': {'text': 'Your code: 482913', 'html': '<b>482913</b>'},
+        }))
+
+        message = provider.fetch('m1')
+        self.assertEqual(provider.session.requests[0][0], f"{provider._mailbox_url}/m1")
+        self.assertEqual(message.sender, 'noreply@example.com')
+        self.assertEqual(message.body_text, 'Your code: 482913')
+        self.assertEqual(message.body_html, '<b>482913</b>')
+        self.assertEqual(message.received_at, datetime.fromtimestamp(1_700_000_000))
+
+    def test_failed_fetch_returns_none(self):
+        provider = make_provider(FakeResponse(status_code=500))
+        self.assertIsNone(provider.fetch('m1'))
+
+
+class TestPollRetry(unittest.TestCase):
+    """正文获取失败的邮件在下一轮重试"""
+
+    def test_failed_fetch_is_retried(self):
+        received_at = datetime.fromtimestamp(1_700_000_000)
+        message = EmailMessage('m1', 'Verify', 'noreply@example.com', 'user@qabq.com', 'code 482913')
+
+        client = mock.Mock(email='user@qabq.com')
+        client.list_ids.side_effect = lambda limit, since: (
+            [('m1', received_at)] if since is None or received_at > since else []
+        )
+        client.fetch.side_effect = [None, message]
+
+        with mock.patch('asyncio.sleep', new=mock.AsyncMock()), \
+                mock.patch('sys.stdout', new=mock.Mock()):
+            found = asyncio.run(poll_emails(client, interval=5, max_polls=12))
+
+        self.assertTrue(found)
+        self.assertEqual(client.fetch.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
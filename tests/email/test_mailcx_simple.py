@@ -4,117 +4,168 @@ mail.cx 定时获取邮件测试
 支持定时轮询邮箱，自动提取验证码
 """
 
+import io
 import sys
 import time
 import os
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from airdrop_email import EmailClient
 
+# 轮询开始时的说明，只需填入时长和邮箱地址
+POLL_HEADER = """
+⏰ 开始定时获取邮件（间隔: 1-15秒递增，最长: {budget}秒）
+   邮箱地址: {email}
+   你可以向这个地址发送测试邮件
+   按 Ctrl+C 可以随时停止
+"""
+
+# 每轮状态行的模板，只需填入轮询次数和邮箱地址（批量模式下区分各邮箱的输出）
+POLL_LINE = "[轮询 {}] {} 检查新邮件...\n"
+
+# 每次列出的邮件数，历史邮件和轮询使用同一个范围，已见集合才能对上
+POLL_LIMIT = 10
+
 
-def poll_emails(client, interval=5, max_polls=12):
+async def poll_emails(client, interval=5, max_polls=12, seen_ids=None):
     """
     定时轮询邮件
 
+    空轮询后按指数退避（带随机抖动）增加间隔，总时长为 interval * max_polls 秒
+
     Args:
         client: EmailClient 实例
-        interval: 轮询间隔（秒），默认 5 秒
-        max_polls: 最大轮询次数，默认 12 次（1 分钟）
+        interval: 平均轮询间隔（秒），默认 5 秒，用于计算总时长
+        max_polls: 平均轮询次数，默认 12 次（1 分钟），用于计算总时长
+        seen_ids: 已显示过的邮件 ID 集合，多次轮询共用时不会重复显示
 
     Returns:
         bool: 是否找到新邮件
     """
-    print(f"\n⏰ 开始定时获取邮件（间隔: {interval}秒，最多: {max_polls}次）")
-    print(f"   邮箱地址: {client.email}")
-    print(f"   你可以向这个地址发送测试邮件")
-    print(f"   按 Ctrl+C 可以随时停止\n")
-
-    seen_ids = set()
-
-    for poll_count in range(1, max_polls + 1):
-        try:
-            print(f"[轮询 {poll_count}/{max_polls}] 检查新邮件...")
-
-            # 获取邮件
-            messages = client.get_messages(limit=10)
-
-            # 检查新邮件
-            new_messages = [msg for msg in messages if msg.id not in seen_ids]
-
-            if new_messages:
-                print(f"✅ 发现 {len(new_messages)} 封新邮件！\n")
-
-                for i, msg in enumerate(new_messages, 1):
-                    print(f"📧 新邮件 {i}:")
-                    print(f"   主题: {msg.subject}")
-                    print(f"   发件人: {msg.sender}")
-                    print(f"   时间: {msg.received_at}")
-
-                    # 提取验证码
-                    code = EmailClient.extract_code(msg)
-                    if code:
-                        print(f"   🔑 验证码: {code}")
-
-                    # 提取链接
-                    link = EmailClient.extract_link(msg, keyword='verify')
-                    if link:
-                        print(f"   🔗 验证链接: {link[:80]}...")
-
-                    # 显示邮件预览
-                    if msg.body_text:
-                        preview = msg.body_text[:150].replace('\n', ' ')
-                        print(f"   预览: {preview}...")
+    budget = interval * max_polls
+    print(POLL_HEADER.format(budget=budget, email=client.email))
+
+    # 只请求比已见邮件更新的邮件；seen_ids 仅用于兜底时间戳精度问题
+    last_seen_at = None
+    if seen_ids is None:
+        seen_ids = set()
+
+    # 每轮复用同一个列表存放新邮件，避免重复分配
+    new_messages = []
+
+    # 循环中反复使用的函数提前绑定为局部变量，省去全局/属性查找
+    to_thread = asyncio.to_thread
+    list_ids = client.list_ids
+    fetch = client.fetch
+    monotonic = time.monotonic
+    write = sys.stdout.write
+    poll_line = POLL_LINE.format
+    email = client.email
+
+    deadline = monotonic() + budget
+    delay = 1.0
+    poll_count = 0
 
-                    print()
-
-                    # 标记为已见
-                    seen_ids.add(msg.id)
-
-                return True
-            else:
-                # 更新已见邮件
-                for msg in messages:
-                    seen_ids.add(msg.id)
-
-                print(f"   暂无新邮件（已有 {len(messages)} 封）")
-
-            # 如果不是最后一次轮询，等待
-            if poll_count < max_polls:
-                time.sleep(interval)
-
-        except KeyboardInterrupt:
-            print("\n\n⚠️  用户中断")
-            return False
-        except Exception as e:
-            print(f"   ❌ 错误: {e}")
-            if poll_count < max_polls:
-                time.sleep(interval)
+    try:
+        while monotonic() < deadline:
+            poll_count += 1
+            try:
+                write(poll_line(poll_count, email))
+
+                # 只获取邮件 ID（在线程中执行阻塞的 HTTP 请求，不阻塞事件循环）
+                ids = await to_thread(list_ids, limit=POLL_LIMIT, since=last_seen_at)
+
+                # 单次遍历：去重，并只为新邮件获取正文
+                new_messages.clear()
+                newest = last_seen_at
+                fetch_failed = False
+                for msg_id, received_at in ids:
+                    if received_at and (newest is None or received_at > newest):
+                        newest = received_at
+
+                    if msg_id in seen_ids:
+                        continue
+
+                    msg = await to_thread(fetch, msg_id)
+                    if msg is None:
+                        # 获取失败的邮件不标记为已见，下一轮重试
+                        fetch_failed = True
+                        continue
+
+                    seen_ids.add(msg_id)
+                    new_messages.append(msg)
+
+                # 有邮件获取失败时不推进游标，否则下一轮会把它过滤掉
+                if not fetch_failed:
+                    last_seen_at = newest
+
+                if new_messages:
+                    # 先把报告写入缓冲区，最后一次性输出
+                    buf = io.StringIO()
+                    buf.write(f"✅ {email} 发现 {len(new_messages)} 封新邮件！\n\n")
+
+                    for i, msg in enumerate(new_messages, 1):
+                        buf.write(
+                            f"📧 新邮件 {i}:\n"
+                            f"   主题: {msg.subject}\n"
+                            f"   发件人: {msg.sender}\n"
+                            f"   时间: {msg.received_at}\n"
+                        )
+
+                        # 提取验证码
+                        code = msg.code
+                        if code:
+                            buf.write(f"   🔑 验证码: {code}\n")
+
+                        # 提取链接
+                        link = msg.link('verify')
+                        if link:
+                            buf.write(f"   🔗 验证链接: {link[:80]}...\n")
+
+                        # 显示邮件预览
+                        if msg.body_text:
+                            buf.write(f"   预览: {msg.body_preview}...\n")
+
+                        buf.write("\n")
+
+                    write(buf.getvalue())
+                    sys.stdout.flush()
+                    return True
+                else:
+                    write(f"   {email} 暂无新邮件\n")
+
+            except Exception as e:
+                write(f"   {email} ❌ 错误: {e}\n")
+
+            # 指数退避 + 随机抖动，不超过剩余时间
+            delay = min(delay * 1.5, 15.0) + random.uniform(0, 0.5)
+            remaining = deadline - monotonic()
+            if remaining > 0:
+                await asyncio.sleep(min(delay, remaining))
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n\n⚠️  用户中断")
+        raise
 
-    print(f"\n⌛ 已完成 {max_polls} 次轮询，未发现新邮件")
+    print(f"\n⌛ {email} 已完成 {poll_count} 次轮询，未发现新邮件")
     return False
 
 
-def test_with_polling():
+async def run_with_polling(client, seen_ids=None):
     """测试定时获取邮件功能"""
     print("=" * 60)
     print("mail.cx 定时获取邮件测试")
     print("=" * 60)
 
-    # 创建临时邮箱
-    print("\n[1] 创建临时邮箱...")
-    client = EmailClient.create_temp_email()
-
-    if not client.connect():
-        print("❌ 连接失败")
-        return False
-
-    print(f"✅ 成功创建邮箱: {client.email}")
-    print(f"   注册时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"\n✅ 邮箱: {client.email}")
 
     # 显示现有邮件
-    print("\n[2] 检查现有邮件...")
-    existing_messages = client.get_messages(limit=5)
+    print("\n[1] 检查现有邮件...")
+    existing_messages = await asyncio.to_thread(client.get_messages, limit=POLL_LIMIT)
     if existing_messages:
         print(f"   找到 {len(existing_messages)} 封历史邮件")
         for i, msg in enumerate(existing_messages, 1):
@@ -122,12 +173,13 @@ def test_with_polling():
     else:
         print("   📭 邮箱为空")
 
-    # 定时轮询新邮件
-    print("\n[3] 定时轮询新邮件...")
-    found = poll_emails(client, interval=5, max_polls=12)
+    # 标记为已显示，之后的轮询不再重复显示
+    if seen_ids is not None:
+        seen_ids.update(msg.id for msg in existing_messages)
 
-    # 清理
-    client.disconnect()
+    # 定时轮询新邮件
+    print("\n[2] 定时轮询新邮件...")
+    found = await poll_emails(client, interval=5, max_polls=12, seen_ids=seen_ids)
 
     print("\n" + "=" * 60)
     if found:
@@ -138,24 +190,61 @@ def test_with_polling():
     return True
 
 
-def test_wait_for_specific():
-    """测试等待特定邮件（带验证码）"""
+async def run_with_polling_batch(n=4):
+    """测试同时轮询多个邮箱（网络等待相互重叠，总耗时约等于单个邮箱）"""
     print("=" * 60)
-    print("mail.cx 等待验证邮件测试")
+    print(f"mail.cx 批量定时获取邮件测试（{n} 个邮箱）")
     print("=" * 60)
 
-    # 创建临时邮箱
-    print("\n[1] 创建临时邮箱...")
-    client = EmailClient.create_temp_email()
+    # 并发创建临时邮箱，每个邮箱使用自己的 Session，线程间不共享
+    print(f"\n[1] 创建 {n} 个临时邮箱...")
+    clients = [EmailClient.create_temp_email() for _ in range(n)]
+    loop = asyncio.get_running_loop()
+
+    try:
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            connected = await asyncio.gather(
+                *(loop.run_in_executor(pool, client.connect) for client in clients)
+            )
+
+        clients_ok = [client for client, ok in zip(clients, connected) if ok]
+        if not clients_ok:
+            print("❌ 连接失败")
+            return False
+
+        for client in clients_ok:
+            print(f"✅ 成功创建邮箱: {client.email}")
+
+        # 同时轮询所有邮箱
+        print("\n[2] 同时轮询新邮件...")
+        results = await asyncio.gather(
+            *(poll_emails(client, interval=5, max_polls=12) for client in clients_ok)
+        )
+    finally:
+        for client in clients:
+            client.disconnect()
+
+    print("\n" + "=" * 60)
+    print(f"✅ 测试完成！{sum(results)}/{len(results)} 个邮箱收到新邮件")
+    print("=" * 60)
+    return True
+
 
-    if not client.connect():
-        print("❌ 连接失败")
-        return False
+def run_wait_for_specific(client, seen_ids=None):
+    """
+    测试等待特定邮件（带验证码）
 
-    print(f"✅ 成功创建邮箱: {client.email}")
+    直接在主线程中调用阻塞的 wait_for_message，按 Ctrl+C 可以立即中断
+    （放到线程中运行时，事件循环退出前必须等线程结束）
+    """
+    print("=" * 60)
+    print("mail.cx 等待验证邮件测试")
+    print("=" * 60)
+
+    print(f"\n✅ 邮箱: {client.email}")
 
     # 等待验证邮件
-    print("\n[2] 等待验证邮件...")
+    print("\n[1] 等待验证邮件...")
     print("   提示：可以向这个邮箱发送包含 'verify' 或 'verification' 的邮件")
     print("   按 Ctrl+C 可以随时停止\n")
 
@@ -167,19 +256,23 @@ def test_wait_for_specific():
         )
 
         if message:
+            # 标记为已显示，之后的轮询不再重复显示
+            if seen_ids is not None:
+                seen_ids.add(message.id)
+
             print(f"\n✅ 收到新邮件！")
             print(f"   主题: {message.subject}")
             print(f"   发件人: {message.sender}")
 
             # 提取验证码
-            code = EmailClient.extract_code(message)
+            code = message.code
             if code:
                 print(f"   🔑 验证码: {code}")
             else:
                 print(f"   ℹ️  未找到验证码")
 
             # 提取链接
-            link = EmailClient.extract_link(message)
+            link = message.link()
             if link:
                 print(f"   🔗 链接: {link}")
         else:
@@ -188,9 +281,6 @@ def test_wait_for_specific():
     except KeyboardInterrupt:
         print("\n\n⚠️  用户中断")
 
-    # 清理
-    client.disconnect()
-
     print("\n" + "=" * 60)
     print("✅ 测试完成")
     print("=" * 60)
@@ -203,63 +293,80 @@ def show_menu():
     print("1. 定时轮询模式（主动检查，默认 1 分钟）")
     print("2. 等待模式（等待新邮件，默认 60 秒）")
     print("3. 快速测试（仅检查当前邮件）")
+    print("4. 批量轮询模式（同时轮询 4 个邮箱，默认 1 分钟）")
     print("0. 退出")
 
-    choice = input("\n请输入选项 (1/2/3/0): ").strip()
+    choice = input("\n请输入选项 (1/2/3/4/0): ").strip()
     return choice
 
 
-def quick_test():
+def quick_test(client, seen_ids=None):
     """快速测试 - 仅检查当前邮件"""
     print("=" * 60)
     print("mail.cx 快速测试")
     print("=" * 60)
 
-    client = EmailClient.create_temp_email()
-
-    if not client.connect():
-        print("❌ 连接失败")
-        return False
-
     print(f"\n✅ 邮箱: {client.email}")
 
-    messages = client.get_messages(limit=5)
+    messages = client.get_messages(limit=POLL_LIMIT)
     print(f"✅ 找到 {len(messages)} 封邮件")
 
+    # 标记为已显示，之后的轮询不再重复显示
+    if seen_ids is not None:
+        seen_ids.update(msg.id for msg in messages)
+
     if messages:
         for i, msg in enumerate(messages, 1):
             print(f"\n邮件 {i}:")
             print(f"  主题: {msg.subject}")
             print(f"  发件人: {msg.sender}")
 
-            code = EmailClient.extract_code(msg)
+            code = msg.code
             if code:
                 print(f"  验证码: {code}")
 
-    client.disconnect()
     print(f"\n✅ 测试完成")
     return True
 
 
 if __name__ == '__main__':
     try:
-        while True:
-            choice = show_menu()
-
-            if choice == '1':
-                test_with_polling()
-                break
-            elif choice == '2':
-                test_wait_for_specific()
-                break
-            elif choice == '3':
-                quick_test()
-                break
-            elif choice == '0':
-                print("\n👋 再见！")
-                sys.exit(0)
-            else:
-                print("\n❌ 无效选项，请重新选择")
+        # 所有模式共用同一个临时邮箱，只在退出时关闭（批量模式自行创建邮箱）
+        print("创建临时邮箱...")
+        with EmailClient.create_temp_email() as client:
+            if not client.auth_token:
+                print("❌ 连接失败")
+                sys.exit(1)
+
+            print(f"✅ 成功创建邮箱: {client.email}")
+            print(f"   注册时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+            # 已显示过的邮件 ID，在各模式间共用，避免重复显示
+            seen_ids = set()
+
+            while True:
+                choice = show_menu()
+
+                # Ctrl+C 只中断当前模式，所有模式都回到菜单
+                if choice == '1':
+                    try:
+                        asyncio.run(run_with_polling(client, seen_ids))
+                    except KeyboardInterrupt:
+                        pass
+                elif choice == '2':
+                    run_wait_for_specific(client, seen_ids)
+                elif choice == '3':
+                    quick_test(client, seen_ids)
+                elif choice == '4':
+                    try:
+                        asyncio.run(run_with_polling_batch())
+                    except KeyboardInterrupt:
+                        pass
+                elif choice == '0':
+                    print("\n👋 再见！")
+                    sys.exit(0)
+                else:
+                    print("\n❌ 无效选项，请重新选择")
 
     except KeyboardInterrupt:
         print("\n\n👋 再见！")
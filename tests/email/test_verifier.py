@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+CodeExtractor 离线测试
+不访问网络，直接用构造的邮件验证验证码和链接提取
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from airdrop_email.base import EmailMessage
+from airdrop_email import verifier
+from airdrop_email.verifier import CodeExtractor
+
+
+def make_message(body_text='', body_html=None):
+    """构造一封测试邮件"""
+    return EmailMessage(
+        id='1',
+        subject='Test',
+        sender='noreply@example.com',
+        recipient='user@example.com',
+        body_text=body_text,
+        body_html=body_html,
+    )
+
+
+class TestSearchCode(unittest.TestCase):
+    """默认模式的优先级和误报过滤"""
+
+    def test_phrase_skips_plain_words(self):
+        # 短语后面跟的是英文单词时不能当作验证码
+        cases = {
+            "Enter the code below to sign in: 482913": '482913',
+            "Use this code within 10 minutes: 482913": '482913',
+            "Your PIN number 4829": '4829',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(CodeExtractor._search_code(text), expected)
+
+    def test_cjk_phrase(self):
+        # 中文前后没有单词边界，验证码后紧跟中文标点也要能命中
+        self.assertEqual(CodeExtractor._search_code("您的验证码：A7K9Q2。请勿泄露"), 'A7K9Q2')
+
+    def test_false_positive_does_not_hide_other_patterns(self):
+        # 年份被过滤后，后面的验证码仍然要能命中
+        cases = {
+            '2024 Acme: 482913': '482913',
+            'Welcome 2024 member 557712': '557712',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(CodeExtractor._search_code(text), expected)
+
+    def test_six_digits_before_four_digits(self):
+        self.assertEqual(CodeExtractor._search_code("Order 4471 shipped. Passcode: 482913"), '482913')
+
+    def test_letter_only_phrase_codes(self):
+        # 短语后面的纯字母验证码仍然要能找到
+        cases = {
+            "Your code: ABCD": 'ABCD',
+            "Verification code: QWERT": 'QWERT',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(CodeExtractor._search_code(text), expected)
+
+    def test_dates_and_years_are_skipped(self):
+        self.assertIsNone(CodeExtractor._search_code("Sent 2024-01-31 and 01/31/2024"))
+        self.assertEqual(CodeExtractor._search_code("Copyright 2024. Code 5821"), '5821')
+
+    def test_url_parameter_wins(self):
+        text = "Your code 482913 or open https://example.com/v?code=QW12ER"
+        self.assertEqual(CodeExtractor._search_code(text), 'QW12ER')
+
+
+class TestExtractCode(unittest.TestCase):
+    """纯文本和 HTML 正文的扫描顺序"""
+
+    def test_stub_plain_part_falls_back_to_html(self):
+        # 多段邮件中纯文本只是提示语时，应使用 HTML 中的验证码
+        message = make_message(
+            body_text="This message requires an HTML-capable email client to be displayed.",
+            body_html="<html><body><h1>482913</h1></body></html>",
+        )
+        self.assertEqual(CodeExtractor.extract_code(message), '482913')
+
+    def test_long_plain_text_code_is_used(self):
+        message = make_message(
+            body_text="Hello, thanks for signing up. Your verification code: 731904. It expires soon.",
+            body_html="<p>Ignore 555123</p>",
+        )
+        self.assertEqual(CodeExtractor.extract_code(message), '731904')
+
+    def test_use_html_false_ignores_html(self):
+        message = make_message(body_text="Hi", body_html="<b>904117</b>")
+        self.assertIsNone(CodeExtractor.extract_code(message, use_html=False))
+
+    def test_html_only(self):
+        message = make_message(
+            body_html="<html><head><style>.c{color:red}</style></head>"
+                      "<body><p>Your code is</p><div class='c'>904117</div></body></html>",
+        )
+        self.assertEqual(CodeExtractor.extract_code(message), '904117')
+
+    def test_regex_tag_strip_keeps_bare_less_than(self):
+        # 没有 selectolax 时用正则去标签，文本中的 "<" 不能吞掉后面的内容
+        html = "<!DOCTYPE html><p>if x<5 then</p><script>var a = '<b>';</script><p>code 482913</p>"
+        with mock.patch.object(verifier, '_HP', None):
+            self.assertEqual(verifier._html_to_text_fast(html), 'if x<5 then code 482913')
+
+    def test_custom_pattern(self):
+        message = make_message(body_text="Ref: X-4821-Z")
+        self.assertEqual(CodeExtractor.extract_code(message, pattern=r'X-(\d+)-Z'), '4821')
+        # 第二次调用使用缓存的编译结果
+        self.assertEqual(CodeExtractor.extract_code(message, pattern=r'X-(\d+)-Z'), '4821')
+
+
+class TestExtractAllCodes(unittest.TestCase):
+    """所有候选验证码的提取"""
+
+    def test_codes_are_unique_and_filtered(self):
+        message = make_message(
+            body_text="Code 482913, backup code 5821. Year 2024.",
+            body_html="<a href='https://example.com/v?token=TK9X2'>go</a>",
+        )
+        codes = CodeExtractor.extract_all_codes(message)
+        self.assertIn('482913', codes)
+        self.assertIn('5821', codes)
+        self.assertNotIn('2024', codes)
+        self.assertEqual(len(codes), len(set(codes)))
+
+    def test_text_without_digits(self):
+        # 没有数字时跳过纯数字模式，仍然能找到字母验证码
+        message = make_message(body_text="Your code: QWERTY")
+        self.assertEqual(CodeExtractor.extract_all_codes(message, use_html=False), ['QWERTY'])
+
+
+class TestExtractLink(unittest.TestCase):
+    """HTML 链接和纯文本链接的提取"""
+
+    HTML = (
+        "<a href='https://example.com/unsubscribe'>Unsubscribe</a>"
+        "<a href='mailto:help@example.com'>Help</a>"
+        "<a href='https://example.com/account/verify?t=1'>Verify email</a>"
+    )
+
+    def test_keyword_in_href(self):
+        message = make_message(body_html=self.HTML)
+        self.assertEqual(
+            CodeExtractor.extract_link(message, 'verify'),
+            'https://example.com/account/verify?t=1'
+        )
+
+    def test_keyword_in_link_text(self):
+        # 关键词大小写不敏感，同时匹配链接文本
+        message = make_message(body_html="<a href='https://example.com/x/1'>Confirm account</a>")
+        self.assertEqual(CodeExtractor.extract_link(message, 'CONFIRM'), 'https://example.com/x/1')
+
+    def test_first_http_link(self):
+        message = make_message(body_html="<a href='mailto:a@b.c'>a</a>" + self.HTML)
+        self.assertEqual(CodeExtractor.extract_link(message), 'https://example.com/unsubscribe')
+
+    def test_plain_text_fallback(self):
+        message = make_message(
+            body_text="Open https://example.com/home or https://example.com/verify/abc to finish."
+        )
+        self.assertEqual(CodeExtractor.extract_link(message, 'verify'), 'https://example.com/verify/abc')
+        self.assertEqual(CodeExtractor.extract_link(message), 'https://example.com/home')
+
+    def test_no_link(self):
+        message = make_message(body_text="Nothing here", body_html="<p>Nothing here</p>")
+        self.assertIsNone(CodeExtractor.extract_link(message, 'verify'))
+
+
+if __name__ == '__main__':
+    unittest.main()